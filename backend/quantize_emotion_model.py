@@ -0,0 +1,38 @@
+"""
+ETHERIAL PARTICLES - Emotion Model Quantization
+===============================================
+Exports FER's bundled emotion CNN to ONNX and quantizes its weights to INT8
+for the server's optional ONNX emotion classifier.
+
+Requires (one-off, not needed by the server): tensorflow, tf2onnx, onnxruntime
+
+Run with: python quantize_emotion_model.py [output.onnx]
+Then start the server with FER_ONNX_MODEL=<output.onnx>
+"""
+
+import os
+import sys
+
+import fer
+import tf2onnx
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from tensorflow.keras.models import load_model
+
+
+def main():
+    output_path = sys.argv[1] if len(sys.argv) > 1 else "fer-int8.onnx"
+    float_path = os.path.splitext(output_path)[0] + "-fp32.onnx"
+
+    # FER ships its emotion classifier as a Keras HDF5 model
+    keras_path = os.path.join(os.path.dirname(fer.__file__), "data", "emotion_model.hdf5")
+    model = load_model(keras_path, compile=False)
+
+    tf2onnx.convert.from_keras(model, output_path=float_path)
+    print(f"✅ Exported {keras_path} -> {float_path}")
+
+    quantize_dynamic(float_path, output_path, weight_type=QuantType.QInt8)
+    print(f"✅ Quantized to INT8 -> {output_path}")
+
+
+if __name__ == "__main__":
+    main()
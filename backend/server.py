@@ -12,19 +12,28 @@ Run with: uvicorn server:app --reload --host 0.0.0.0 --port 8001
 
 import asyncio
 import base64
-import json
 import logging
+import os
+import queue
+import struct
+import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 from io import BytesIO
-from typing import Dict, List, Optional
+from itertools import chain
+from operator import attrgetter
+from types import SimpleNamespace
+from typing import BinaryIO, Dict, List, Optional, Union
 
 import cv2
 import numpy as np
+import orjson
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse
-from PIL import Image
 
 # ML Libraries
 try:
@@ -43,11 +52,25 @@ except ImportError:
 
 try:
     import librosa
+    import soundfile
     LIBROSA_AVAILABLE = True
 except ImportError:
     LIBROSA_AVAILABLE = False
     logging.warning("Librosa not available - beat detection disabled")
 
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+try:
+    import aubio
+    AUBIO_AVAILABLE = True
+except ImportError:
+    AUBIO_AVAILABLE = False
+    logging.info("aubio not available - using librosa beat tracking")
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -72,59 +95,315 @@ app.add_middleware(
 # ML Model Initializers
 # ====================
 
-# Emotion Detector
-emotion_detector = None
+# Threads running detector calls. MediaPipe releases the GIL inside
+# .process(), so several instances can run in parallel across cores.
+INFERENCE_WORKERS = 4
+inference_pool = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+# FER keeps a single instance, so it gets its own thread instead of parking
+# inference_pool threads while they wait for it
+emotion_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="emotion")
+
+# Model variants (override via environment). The "lite" pose model and an
+# unrefined face mesh are plenty for driving particles; the frontend does not
+# use iris landmarks.
+MP_POSE_COMPLEXITY = int(os.getenv("MP_POSE_COMPLEXITY", "0"))
+MP_FACE_REFINE = os.getenv("MP_FACE_REFINE", "0").lower() in ("1", "true", "yes")
+
+
+class DetectorPool:
+    """
+    Detector instances shared by the inference threads.
+    
+    MediaPipe solution objects are not thread-safe, and with
+    static_image_mode=False they track landmarks from one frame to the next,
+    so a video stream needs the same instance for every frame. WebSocket
+    connections check out an instance for their lifetime; one-off calls
+    borrow one per call. The pool keeps up to `size` idle instances and
+    creates more when every instance is checked out.
+    """
+    
+    def __init__(self, factory, size: int):
+        self.factory = factory
+        self.size = size
+        # LIFO: reuse the most recently returned (warm) instance
+        self.instances: queue.LifoQueue = queue.LifoQueue()
+        for _ in range(size):
+            self.instances.put(factory())
+    
+    def checkout(self):
+        """Take an instance for exclusive use, creating one if none is idle (slow when it does)"""
+        try:
+            return self.instances.get_nowait()
+        except queue.Empty:
+            return self.factory()
+    
+    def checkin(self, detector):
+        """Return an instance, clearing its tracking state for the next user"""
+        if self.instances.qsize() >= self.size:
+            close = getattr(detector, "close", None)
+            if close:
+                close()
+            return
+        reset = getattr(detector, "reset", None)
+        if reset:
+            reset()
+        self.instances.put(detector)
+    
+    @contextmanager
+    def acquire(self):
+        # Never waits for an instance: connections may hold all of them
+        detector = self.checkout()
+        try:
+            yield detector
+        finally:
+            self.checkin(detector)
+    
+    @contextmanager
+    def use(self, detector=None):
+        """Use a checked-out instance if given, otherwise borrow one for the call"""
+        if detector is not None:
+            yield detector
+        else:
+            with self.acquire() as detector:
+                yield detector
+
+
+# GPU inference (opt-in). With MP_DELEGATE=gpu, pose/face mesh/hands run
+# through the MediaPipe Tasks API on the GPU delegate. Tasks load .task model
+# bundles from MP_POSE_MODEL / MP_FACE_MODEL / MP_HAND_MODEL; a detector
+# without a bundle stays on the CPU solutions API. Leave this off on CPU-only
+# hosts.
+MP_DELEGATE = os.getenv("MP_DELEGATE", "cpu").lower()
+
+
+class TaskLandmarker:
+    """
+    MediaPipe Tasks landmarker (GPU delegate) behind the solutions ``.process()`` contract.
+    
+    Results are adapted to the attributes the analyzers read from the
+    solutions API (pose_landmarks, multi_face_landmarks, multi_hand_landmarks,
+    multi_handedness), so the analyzers work unchanged with either backend.
+    """
+    
+    def __init__(self, kind: str, model_path: str):
+        vision = mp.tasks.vision
+        base_options = mp.tasks.BaseOptions(
+            model_asset_path=model_path,
+            delegate=mp.tasks.BaseOptions.Delegate.GPU
+        )
+        running_mode = vision.RunningMode.VIDEO
+        
+        if kind == "pose":
+            self.landmarker = vision.PoseLandmarker.create_from_options(vision.PoseLandmarkerOptions(
+                base_options=base_options,
+                running_mode=running_mode,
+                num_poses=1,
+                min_pose_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            ))
+        elif kind == "face_mesh":
+            self.landmarker = vision.FaceLandmarker.create_from_options(vision.FaceLandmarkerOptions(
+                base_options=base_options,
+                running_mode=running_mode,
+                num_faces=1,
+                min_face_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            ))
+        elif kind == "hands":
+            self.landmarker = vision.HandLandmarker.create_from_options(vision.HandLandmarkerOptions(
+                base_options=base_options,
+                running_mode=running_mode,
+                num_hands=2,
+                min_hand_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            ))
+        else:
+            raise ValueError(f"Unknown landmarker kind: {kind}")
+        
+        self.kind = kind
+        self.last_timestamp = 0
+    
+    def close(self):
+        self.landmarker.close()
+    
+    def process(self, rgb_image: np.ndarray) -> SimpleNamespace:
+        # VIDEO mode needs strictly increasing timestamps per instance
+        timestamp = max(self.last_timestamp + 1, int(time.monotonic() * 1000))
+        self.last_timestamp = timestamp
+        
+        image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_image)
+        result = self.landmarker.detect_for_video(image, timestamp)
+        
+        if self.kind == "pose":
+            return SimpleNamespace(
+                pose_landmarks=SimpleNamespace(landmark=result.pose_landmarks[0])
+                if result.pose_landmarks else None
+            )
+        if self.kind == "face_mesh":
+            return SimpleNamespace(
+                multi_face_landmarks=[SimpleNamespace(landmark=face) for face in result.face_landmarks] or None
+            )
+        return SimpleNamespace(
+            multi_hand_landmarks=[SimpleNamespace(landmark=hand) for hand in result.hand_landmarks] or None,
+            multi_handedness=[
+                SimpleNamespace(classification=[SimpleNamespace(label=categories[0].category_name)])
+                for categories in result.handedness
+            ] or None
+        )
+
+
+def landmarker_factory(kind: str, model_env: str, cpu_factory):
+    """
+    Use the GPU Tasks landmarker when enabled and a model bundle is configured.
+    
+    GPU is only a speed-up: if the delegate can't be created (no GL context,
+    bad model path, ...) the CPU solution is used instead.
+    """
+    model_path = os.getenv(model_env)
+    if MP_DELEGATE != "gpu" or not model_path:
+        return cpu_factory
+    
+    def factory():
+        try:
+            detector = TaskLandmarker(kind, model_path)
+            logger.info(f"Using GPU delegate for {kind} ({model_path})")
+            return detector
+        except Exception as e:
+            logger.warning(f"GPU delegate unavailable for {kind}, falling back to CPU: {e}")
+            return cpu_factory()
+    
+    return factory
+
+
+class OnnxEmotionClassifier:
+    """
+    FER's emotion CNN exported to ONNX and quantized to INT8.
+    
+    Build the model with ``python quantize_emotion_model.py`` and point
+    FER_ONNX_MODEL at the output. Faces are framed exactly like
+    FER.detect_emotions: the box is squared, widened by FER's emotion offsets
+    and cropped from a zero-padded grayscale image, then resized to the model
+    input and scaled to [-1, 1].
+    """
+    
+    LABELS = ("angry", "disgust", "fear", "happy", "sad", "surprise", "neutral")
+    PADDING = 40          # FER.PADDING
+    OFFSETS = (10, 10)    # FER's default emotion_offsets
+    
+    def __init__(self, model_path: str):
+        self.session = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        _, self.input_h, self.input_w, _ = model_input.shape  # NHWC (Keras export)
+    
+    @staticmethod
+    def to_square(box) -> tuple:
+        """Elongate the shorter side of (x, y, w, h), as FER.tosquare does"""
+        x, y, w, h = box
+        if h > w:
+            x -= (h - w) // 2
+            w = h
+        elif w > h:
+            y -= (w - h) // 2
+            h = w
+        return x, y, w, h
+    
+    def classify(self, image: np.ndarray, boxes: List) -> List[Dict]:
+        """Classify each face box; returns FER-style [{"box": [...], "emotions": {...}}]"""
+        # Same gray conversion FER applies to the frames it is given
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        gray = cv2.copyMakeBorder(gray, self.PADDING, self.PADDING, self.PADDING, self.PADDING,
+                                  cv2.BORDER_CONSTANT, value=0)
+        
+        results = []
+        for box in boxes:
+            box = [int(v) for v in box]
+            x, y, w, h = self.to_square(box)
+            # Offset box in padded-image coordinates; MTCNN boxes can start at negative x/y
+            x1 = max(0, x - self.OFFSETS[0] + self.PADDING)
+            y1 = max(0, y - self.OFFSETS[1] + self.PADDING)
+            x2 = x + w + self.OFFSETS[0] + self.PADDING
+            y2 = y + h + self.OFFSETS[1] + self.PADDING
+            face = gray[y1:y2, x1:x2]
+            if face.size == 0:
+                continue
+            
+            face = cv2.resize(face, (self.input_w, self.input_h))
+            face = (face.astype(np.float32) / 255.0 - 0.5) * 2.0
+            scores = self.session.run(None, {self.input_name: face[np.newaxis, :, :, np.newaxis]})[0][0]
+            results.append({
+                "box": box,
+                "emotions": {label: round(float(score), 2) for label, score in zip(self.LABELS, scores)}
+            })
+        return results
+
+
+# Emotion face detector: MTCNN is far heavier than FER's default Haar cascade,
+# and is mostly bypassed anyway when a face box is already known
+FER_MTCNN = os.getenv("FER_MTCNN", "0").lower() in ("1", "true", "yes")
+
+# Emotion Detector (a single FER model; calls are serialized on emotion_pool)
+emotion_detectors = None
 if FER_AVAILABLE:
     try:
-        emotion_detector = FER(mtcnn=True)
-        logger.info("✅ Emotion detector initialized")
+        emotion_detectors = DetectorPool(lambda: FER(mtcnn=FER_MTCNN), 1)
+        logger.info(f"✅ Emotion detector initialized ({'MTCNN' if FER_MTCNN else 'Haar cascade'})")
     except Exception as e:
         logger.error(f"Failed to initialize emotion detector: {e}")
 
+# Optional INT8 emotion classifier replacing FER's Keras model
+emotion_classifier = None
+if FER_AVAILABLE and ONNXRUNTIME_AVAILABLE and os.getenv("FER_ONNX_MODEL"):
+    try:
+        emotion_classifier = OnnxEmotionClassifier(os.getenv("FER_ONNX_MODEL"))
+        logger.info("✅ INT8 ONNX emotion classifier initialized")
+    except Exception as e:
+        logger.error(f"Failed to initialize ONNX emotion classifier: {e}")
+
 # MediaPipe Pose
-pose_detector = None
+pose_detectors = None
 if MEDIAPIPE_AVAILABLE:
     try:
         mp_pose = mp.solutions.pose
-        pose_detector = mp_pose.Pose(
+        pose_detectors = DetectorPool(landmarker_factory("pose", "MP_POSE_MODEL", lambda: mp_pose.Pose(
             static_image_mode=False,
-            model_complexity=1,
-            smooth_landmarks=True,
+            model_complexity=MP_POSE_COMPLEXITY,
+            smooth_landmarks=False,  # Smoothed per connection by OneEuroFilter
             min_detection_confidence=0.5,
             min_tracking_confidence=0.5
-        )
-        logger.info("✅ Pose detector initialized")
+        )), INFERENCE_WORKERS)
+        logger.info(f"✅ Pose detector initialized (x{INFERENCE_WORKERS})")
     except Exception as e:
         logger.error(f"Failed to initialize pose detector: {e}")
 
 # MediaPipe Face Mesh (468 landmarks)
-face_mesh_detector = None
+face_mesh_detectors = None
 if MEDIAPIPE_AVAILABLE:
     try:
         mp_face_mesh = mp.solutions.face_mesh
-        face_mesh_detector = mp_face_mesh.FaceMesh(
+        face_mesh_detectors = DetectorPool(landmarker_factory("face_mesh", "MP_FACE_MODEL", lambda: mp_face_mesh.FaceMesh(
             static_image_mode=False,
             max_num_faces=1,
-            refine_landmarks=True,  # Enables iris landmarks
+            refine_landmarks=MP_FACE_REFINE,  # Iris landmarks (468-477)
             min_detection_confidence=0.5,
             min_tracking_confidence=0.5
-        )
-        logger.info("✅ Face Mesh detector initialized (468 landmarks)")
+        )), INFERENCE_WORKERS)
+        logger.info(f"✅ Face Mesh detector initialized (468 landmarks, x{INFERENCE_WORKERS})")
     except Exception as e:
         logger.error(f"Failed to initialize face mesh detector: {e}")
 
 # MediaPipe Hands (21 landmarks per hand)
-hand_detector = None
+hand_detectors = None
 if MEDIAPIPE_AVAILABLE:
     try:
         mp_hands = mp.solutions.hands
-        hand_detector = mp_hands.Hands(
+        hand_detectors = DetectorPool(landmarker_factory("hands", "MP_HAND_MODEL", lambda: mp_hands.Hands(
             static_image_mode=False,
             max_num_hands=2,
             min_detection_confidence=0.5,
             min_tracking_confidence=0.5
-        )
-        logger.info("✅ Hand detector initialized (21 landmarks x 2 hands)")
+        )), INFERENCE_WORKERS)
+        logger.info(f"✅ Hand detector initialized (21 landmarks x 2 hands, x{INFERENCE_WORKERS})")
     except Exception as e:
         logger.error(f"Failed to initialize hand detector: {e}")
 
@@ -132,6 +411,9 @@ if MEDIAPIPE_AVAILABLE:
 # WebSocket Manager
 # ====================
 
+# Seconds a single client may take to accept a broadcast message
+BROADCAST_TIMEOUT = 1.0
+
 class ConnectionManager:
     """Manage WebSocket connections for real-time updates"""
     
@@ -152,12 +434,17 @@ class ConnectionManager:
         logger.info(f"Client disconnected. Total: {len(self.active_connections)}")
     
     async def broadcast(self, message: dict):
-        """Send message to all connected clients"""
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except:
-                pass
+        """Send message to all connected clients concurrently, dropping dead or stalled ones"""
+        connections = list(self.active_connections)
+        results = await asyncio.gather(
+            *(asyncio.wait_for(connection.send_json(message), timeout=BROADCAST_TIMEOUT)
+              for connection in connections),
+            return_exceptions=True
+        )
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Dropping client after failed broadcast: {result!r}")
+                self.disconnect(connection)
 
 manager = ConnectionManager()
 
@@ -165,25 +452,156 @@ manager = ConnectionManager()
 # Image Processing
 # ====================
 
-def decode_base64_image(data: str) -> np.ndarray:
-    """Decode base64 image string to OpenCV format"""
+# Longest side (px) of frames handed to the analyzers
+MAX_FRAME_SIDE = 320
+
+
+class FrameBuffers:
+    """
+    Named uint8 image buffers reused across the frames of one connection.
+    
+    A buffer is only reallocated when the requested shape changes, so a
+    steady stream of same-sized frames stops churning the allocator.
+    """
+    
+    def __init__(self):
+        self.buffers: Dict[str, np.ndarray] = {}
+    
+    def get(self, name: str, shape: tuple) -> np.ndarray:
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = self.buffers[name] = np.empty(shape, np.uint8)
+        return buffer
+
+
+def decode_base64_image(data: str, buffers: Optional[FrameBuffers] = None) -> np.ndarray:
+    """Decode base64 image string to OpenCV format (BGR), resizing into ``buffers`` if given"""
     # Remove data URL prefix if present
-    if ',' in data:
-        data = data.split(',')[1]
+    return decode_image(base64.b64decode(data.split(',', 1)[-1]), buffers)
+
+
+def decode_image(image_bytes: Union[bytes, memoryview], buffers: Optional[FrameBuffers] = None) -> np.ndarray:
+    """Decode raw JPEG/PNG bytes to OpenCV format (BGR), resizing into ``buffers`` if given"""
+    # imdecode auto-detects JPEG/PNG and already returns BGR
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode image data")
+    
+    # Downscale large frames before analysis. Landmarks are normalized to
+    # [0, 1], so results are unaffected by the resize.
+    h, w = image.shape[:2]
+    scale = MAX_FRAME_SIDE / max(h, w)
+    if scale < 1:
+        size = (int(w * scale), int(h * scale))
+        dst = buffers.get("bgr", (size[1], size[0], 3)) if buffers else None
+        image = cv2.resize(image, size, dst=dst, interpolation=cv2.INTER_AREA)
+    return image
+
+# Face ROI caching for emotion detection
+FACE_ROI_PADDING = 0.3         # Fraction of the face box added on each side
+# Full-frame detection at least every N emotion analyses. Counted in analyses,
+# not frames: with the EMOTION_INTERVAL throttle 10 analyses is ~5 s, about
+# what 30 frames would be if emotion ran on only every few frames.
+FACE_REFRESH_EVERY = 10
+FACE_ROI_MAX_CHANGE = 30.0     # Mean abs pixel diff (0-255) that invalidates the ROI
+
+
+class FaceTracker:
+    """
+    Per-connection cache of the last face box found by FER.
+    
+    FER re-runs its face detector (Haar cascade, or MTCNN with FER_MTCNN=1)
+    on every call, which dominates its cost. While the face stays put,
+    feeding it a padded crop around the previous box shrinks the detector's
+    input several times over. A full
+    frame pass is forced every FACE_REFRESH_EVERY analyses, when the crop's
+    content changes too much, or when no face is found in the crop.
+    """
+    
+    def __init__(self):
+        self.box: Optional[tuple] = None  # (x, y, w, h) in frame pixels
+        self.since_full = 0
+        self.prev_thumb: Optional[np.ndarray] = None
+    
+    def roi(self, rgb_image: np.ndarray) -> Optional[tuple]:
+        """Return (x0, y0, crop) around the cached face, or None for a full-frame pass"""
+        if self.box is None or self.since_full >= FACE_REFRESH_EVERY:
+            return None
+        
+        x, y, w, h = self.box
+        pad_x, pad_y = int(w * FACE_ROI_PADDING), int(h * FACE_ROI_PADDING)
+        img_h, img_w = rgb_image.shape[:2]
+        x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+        x1, y1 = min(img_w, x + w + pad_x), min(img_h, y + h + pad_y)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        crop = rgb_image[y0:y1, x0:x1]
+        
+        # Cheap stability check against the previous crop of the same box
+        thumb = cv2.resize(crop, (32, 32), interpolation=cv2.INTER_AREA)
+        stable = (self.prev_thumb is None
+                  or cv2.absdiff(thumb, self.prev_thumb).mean() <= FACE_ROI_MAX_CHANGE)
+        self.prev_thumb = thumb
+        return (x0, y0, crop) if stable else None
+    
+    def update(self, box: Optional[tuple], full_frame: bool):
+        self.box = box
+        if full_frame:
+            # New reference box: the previous crop is no longer comparable
+            self.since_full = 0
+            self.prev_thumb = None
+        else:
+            self.since_full += 1
+
+
+def detect_emotions(detector, rgb_image: np.ndarray, face_rectangles: Optional[List] = None) -> List[Dict]:
+    """FER-style detection ([{"box": [x, y, w, h], "emotions": {...}}]), using the ONNX classifier if loaded"""
+    if emotion_classifier is None:
+        return detector.detect_emotions(rgb_image, face_rectangles=face_rectangles)
     
-    image_bytes = base64.b64decode(data)
-    image = Image.open(BytesIO(image_bytes))
-    return cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+    if face_rectangles is None:
+        face_rectangles = detector.find_faces(rgb_image, bgr=True)
+    return emotion_classifier.classify(rgb_image, face_rectangles)
 
-def analyze_emotion(image: np.ndarray) -> Dict:
-    """Analyze facial emotions in image"""
-    if not emotion_detector:
+
+def analyze_emotion(rgb_image: np.ndarray, tracker: Optional[FaceTracker] = None,
+                    face_box: Optional[Dict] = None) -> Dict:
+    """
+    Analyze facial emotions in an RGB image.
+    
+    A normalized ``face_box`` (from the face mesh on the same frame) skips face
+    detection entirely; otherwise detection starts near the tracker's last face.
+    """
+    if not emotion_detectors:
         return {"emotion": "unknown", "confidence": 0.0, "all_emotions": {}}
     
     try:
-        # Convert BGR to RGB for FER
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        result = emotion_detector.detect_emotions(rgb_image)
+        img_h, img_w = rgb_image.shape[:2]
+        rect = None
+        if face_box:
+            x0, y0 = max(0, int(face_box["x"] * img_w)), max(0, int(face_box["y"] * img_h))
+            x1 = min(img_w, int((face_box["x"] + face_box["w"]) * img_w))
+            y1 = min(img_h, int((face_box["y"] + face_box["h"]) * img_h))
+            if x1 > x0 and y1 > y0:
+                rect = (x0, y0, x1 - x0, y1 - y0)
+        
+        roi = tracker.roi(rgb_image) if tracker and rect is None else None
+        result = None
+        with emotion_detectors.acquire() as detector:
+            if rect is not None:
+                result = detect_emotions(detector, rgb_image, face_rectangles=[rect])
+            elif roi is not None:
+                x0, y0, crop = roi
+                result = detect_emotions(detector, crop)
+                for face in result:
+                    x, y, w, h = face['box']
+                    face['box'] = [x + x0, y + y0, w, h]
+            if not result:
+                result = detect_emotions(detector, rgb_image)
+        
+        if tracker:
+            tracker.update(tuple(result[0]['box']) if result else None,
+                           full_frame=roi is None or not result)
         
         if result and len(result) > 0:
             emotions = result[0]['emotions']
@@ -198,39 +616,119 @@ def analyze_emotion(image: np.ndarray) -> Dict:
     
     return {"emotion": "neutral", "confidence": 0.0, "all_emotions": {}}
 
-def analyze_pose(image: np.ndarray) -> Dict:
-    """Analyze body pose in image using MediaPipe"""
-    if not pose_detector:
+def landmarks_to_array(landmarks, with_visibility: bool = False) -> np.ndarray:
+    """Copy a MediaPipe landmark list into an (N, 3|4) float32 array in one pass"""
+    fields = ("x", "y", "z", "visibility") if with_visibility else ("x", "y", "z")
+    count = len(landmarks)
+    flat = np.fromiter(
+        chain.from_iterable(map(attrgetter(*fields), landmarks)),
+        dtype=np.float32,
+        count=count * len(fields)
+    )
+    return flat.reshape(count, len(fields))
+
+
+def pack_landmarks(landmarks: np.ndarray) -> Dict:
+    """Flatten a landmark array for the wire: {"xyz": [x0, y0, z0, ...], "stride": 3|4} (serialized by orjson)"""
+    return {"xyz": landmarks.ravel(), "stride": landmarks.shape[1]}
+
+
+def key_points(landmarks: np.ndarray, names: tuple, ids: np.ndarray) -> Dict:
+    """Gather named landmarks in one indexing op: {name: {"x": ..., "y": ...}}"""
+    return {name: {"x": x, "y": y} for name, (x, y) in zip(names, landmarks[ids, :2].tolist())}
+
+
+class OneEuroFilter:
+    """
+    1-Euro low-pass filter over a landmark array (Casiez et al., CHI 2012).
+    
+    The cutoff frequency rises with landmark speed, so jitter is removed while
+    the subject is still without adding noticeable lag when it moves. As in
+    MediaPipe's landmark smoothing, speed is measured in landmark-set sizes
+    per second so near and far subjects are filtered alike.
+    """
+    
+    def __init__(self, min_cutoff: float = 0.05, beta: float = 80.0, d_cutoff: float = 1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.x_prev: Optional[np.ndarray] = None
+        self.dx_prev: Optional[np.ndarray] = None
+        self.t_prev = 0.0
+    
+    @staticmethod
+    def smoothing_factor(cutoff, dt: float):
+        tau = 1.0 / (2 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+    
+    def __call__(self, x: np.ndarray, timestamp: float) -> np.ndarray:
+        """Filter an (N, 3) array of normalized x, y, z coordinates"""
+        if self.x_prev is None or self.x_prev.shape != x.shape:
+            self.x_prev = x.copy()
+            self.dx_prev = np.zeros_like(x)
+            self.t_prev = timestamp
+            return x
+        
+        dt = timestamp - self.t_prev
+        if dt <= 0:
+            return self.x_prev
+        
+        # Average bounding-box side of the landmark set
+        scale = (np.ptp(x[:, 0]) + np.ptp(x[:, 1])) / 2 or 1.0
+        
+        dx = (x - self.x_prev) / (dt * scale)
+        a_d = self.smoothing_factor(self.d_cutoff, dt)
+        dx_hat = a_d * dx + (1 - a_d) * self.dx_prev
+        
+        a = self.smoothing_factor(self.min_cutoff + self.beta * np.abs(dx_hat), dt)
+        x_hat = (a * x + (1 - a) * self.x_prev).astype(np.float32)
+        
+        self.x_prev, self.dx_prev, self.t_prev = x_hat, dx_hat, timestamp
+        return x_hat
+
+
+# Key landmark IDs, gathered with a single fancy-indexing op per frame
+POSE_KEY_NAMES = ("nose", "left_shoulder", "right_shoulder", "left_hand", "right_hand",
+                  "left_hip", "right_hip")
+POSE_KEY_IDS = np.array([0, 11, 12, 15, 16, 23, 24])
+
+FACE_KEY_NAMES = ("face_center", "nose_tip", "chin", "left_eye", "right_eye")
+FACE_KEY_IDS = np.array([1, 4, 152, 33, 263])
+
+# Mouth: 13 (top lip) / 14 (bottom lip); left eye: 159 (top) / 145 (bottom);
+# right eye: 386 (top) / 374 (bottom). Open when the vertical gap exceeds the threshold.
+FACE_OPENING_TOP_IDS = np.array([13, 159, 386])
+FACE_OPENING_BOTTOM_IDS = np.array([14, 145, 374])
+FACE_OPENING_THRESHOLDS = np.array([0.03, 0.015, 0.015])
+
+# Eyebrows: 70 (left), 300 (right)
+FACE_BROW_IDS = np.array([70, 300])
+
+HAND_KEY_NAMES = ("palm_center", "index_tip", "thumb_tip")
+HAND_KEY_IDS = np.array([0, 8, 4])
+
+
+def analyze_pose(rgb_image: np.ndarray, smoother: Optional[OneEuroFilter] = None, detector=None) -> Dict:
+    """Analyze body pose in an RGB image using MediaPipe, optionally smoothing landmarks"""
+    if not pose_detectors:
         return {"landmarks": [], "detected": False}
     
     try:
-        # Convert BGR to RGB
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        results = pose_detector.process(rgb_image)
+        with pose_detectors.use(detector) as detector:
+            results = detector.process(rgb_image)
         
         if results.pose_landmarks:
-            landmarks = []
-            for idx, landmark in enumerate(results.pose_landmarks.landmark):
-                landmarks.append({
-                    "id": idx,
-                    "x": landmark.x,
-                    "y": landmark.y,
-                    "z": landmark.z,
-                    "visibility": landmark.visibility
-                })
+            # (33, 4) array of x, y, z, visibility
+            landmarks = landmarks_to_array(results.pose_landmarks.landmark, with_visibility=True)
+            if smoother:
+                landmarks[:, :3] = smoother(landmarks[:, :3], time.monotonic())
             
             # Extract key body points for particle interaction
             return {
                 "detected": True,
                 "landmarks": landmarks,
                 # Key points for particle effects
-                "nose": {"x": landmarks[0]["x"], "y": landmarks[0]["y"]},
-                "left_hand": {"x": landmarks[15]["x"], "y": landmarks[15]["y"]} if len(landmarks) > 15 else None,
-                "right_hand": {"x": landmarks[16]["x"], "y": landmarks[16]["y"]} if len(landmarks) > 16 else None,
-                "left_shoulder": {"x": landmarks[11]["x"], "y": landmarks[11]["y"]},
-                "right_shoulder": {"x": landmarks[12]["x"], "y": landmarks[12]["y"]},
-                "left_hip": {"x": landmarks[23]["x"], "y": landmarks[23]["y"]} if len(landmarks) > 23 else None,
-                "right_hip": {"x": landmarks[24]["x"], "y": landmarks[24]["y"]} if len(landmarks) > 24 else None,
+                **key_points(landmarks, POSE_KEY_NAMES, POSE_KEY_IDS),
             }
     except Exception as e:
         logger.error(f"Pose detection error: {e}")
@@ -238,56 +736,47 @@ def analyze_pose(image: np.ndarray) -> Dict:
     return {"landmarks": [], "detected": False}
 
 
-def analyze_face_mesh(image: np.ndarray) -> Dict:
-    """Analyze face mesh with 468 landmarks using MediaPipe"""
-    if not face_mesh_detector:
+def analyze_face_mesh(rgb_image: np.ndarray, smoother: Optional[OneEuroFilter] = None, detector=None) -> Dict:
+    """Analyze face mesh with 468 landmarks in an RGB image using MediaPipe, optionally smoothing landmarks"""
+    if not face_mesh_detectors:
         return {"landmarks": [], "detected": False}
     
     try:
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        results = face_mesh_detector.process(rgb_image)
+        with face_mesh_detectors.use(detector) as detector:
+            results = detector.process(rgb_image)
         
         if results.multi_face_landmarks and len(results.multi_face_landmarks) > 0:
-            face_landmarks = results.multi_face_landmarks[0]
-            landmarks = []
-            
-            for idx, landmark in enumerate(face_landmarks.landmark):
-                landmarks.append({
-                    "id": idx,
-                    "x": landmark.x,
-                    "y": landmark.y,
-                    "z": landmark.z
-                })
+            landmarks = landmarks_to_array(results.multi_face_landmarks[0].landmark)
+            if smoother:
+                landmarks = smoother(landmarks, time.monotonic())
             
             # Extract key facial features for particle effects
-            # Mouth landmarks: 13 (top lip), 14 (bottom lip), 78 (left corner), 308 (right corner)
-            mouth_open = abs(landmarks[13]["y"] - landmarks[14]["y"]) > 0.03
-            
-            # Eye landmarks: 159 (left eye top), 145 (left eye bottom), 386 (right eye top), 374 (right eye bottom)
-            left_eye_open = abs(landmarks[159]["y"] - landmarks[145]["y"]) > 0.015
-            right_eye_open = abs(landmarks[386]["y"] - landmarks[374]["y"]) > 0.015
+            mouth_open, left_eye_open, right_eye_open = (
+                np.abs(landmarks[FACE_OPENING_TOP_IDS, 1] - landmarks[FACE_OPENING_BOTTOM_IDS, 1])
+                > FACE_OPENING_THRESHOLDS
+            ).tolist()
             
             # Eyebrow positions for expression
-            left_brow = landmarks[70]["y"]
-            right_brow = landmarks[300]["y"]
-            eyebrows_raised = left_brow < 0.25 or right_brow < 0.25
+            eyebrows_raised = bool((landmarks[FACE_BROW_IDS, 1] < 0.25).any())
+            
+            mouth_center = (landmarks[13, :2] + landmarks[14, :2]) / 2
+            face_min, face_max = landmarks[:, :2].min(axis=0), landmarks[:, :2].max(axis=0)
             
             return {
                 "detected": True,
                 "landmark_count": len(landmarks),
+                "face_box": {
+                    "x": float(face_min[0]), "y": float(face_min[1]),
+                    "w": float(face_max[0] - face_min[0]), "h": float(face_max[1] - face_min[1])
+                },
                 "landmarks": landmarks[:50],  # Send first 50 to reduce payload
                 "features": {
                     "mouth_open": mouth_open,
                     "left_eye_open": left_eye_open,
                     "right_eye_open": right_eye_open,
                     "eyebrows_raised": eyebrows_raised,
-                    "face_center": {"x": landmarks[1]["x"], "y": landmarks[1]["y"]},
-                    "nose_tip": {"x": landmarks[4]["x"], "y": landmarks[4]["y"]},
-                    "chin": {"x": landmarks[152]["x"], "y": landmarks[152]["y"]},
-                    "left_eye": {"x": landmarks[33]["x"], "y": landmarks[33]["y"]},
-                    "right_eye": {"x": landmarks[263]["x"], "y": landmarks[263]["y"]},
-                    "mouth_center": {"x": (landmarks[13]["x"] + landmarks[14]["x"]) / 2,
-                                     "y": (landmarks[13]["y"] + landmarks[14]["y"]) / 2}
+                    **key_points(landmarks, FACE_KEY_NAMES, FACE_KEY_IDS),
+                    "mouth_center": {"x": float(mouth_center[0]), "y": float(mouth_center[1])}
                 }
             }
     except Exception as e:
@@ -296,26 +785,19 @@ def analyze_face_mesh(image: np.ndarray) -> Dict:
     return {"detected": False, "landmarks": []}
 
 
-def analyze_hands(image: np.ndarray) -> Dict:
-    """Analyze hand landmarks and recognize gestures using MediaPipe"""
-    if not hand_detector:
+def analyze_hands(rgb_image: np.ndarray, detector=None) -> Dict:
+    """Analyze hand landmarks in an RGB image and recognize gestures using MediaPipe"""
+    if not hand_detectors:
         return {"hands": [], "detected": False}
     
     try:
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        results = hand_detector.process(rgb_image)
+        with hand_detectors.use(detector) as detector:
+            results = detector.process(rgb_image)
         
         hands = []
         if results.multi_hand_landmarks:
             for hand_idx, hand_landmarks in enumerate(results.multi_hand_landmarks):
-                landmarks = []
-                for idx, landmark in enumerate(hand_landmarks.landmark):
-                    landmarks.append({
-                        "id": idx,
-                        "x": landmark.x,
-                        "y": landmark.y,
-                        "z": landmark.z
-                    })
+                landmarks = landmarks_to_array(hand_landmarks.landmark)
                 
                 # Gesture recognition based on finger positions
                 gesture = recognize_gesture(landmarks)
@@ -329,9 +811,7 @@ def analyze_hands(image: np.ndarray) -> Dict:
                     "handedness": handedness,
                     "landmarks": landmarks,
                     "gesture": gesture,
-                    "palm_center": {"x": landmarks[0]["x"], "y": landmarks[0]["y"]},
-                    "index_tip": {"x": landmarks[8]["x"], "y": landmarks[8]["y"]},
-                    "thumb_tip": {"x": landmarks[4]["x"], "y": landmarks[4]["y"]},
+                    **key_points(landmarks, HAND_KEY_NAMES, HAND_KEY_IDS),
                     "pinch_distance": calculate_distance(landmarks[4], landmarks[8])
                 })
         
@@ -346,91 +826,272 @@ def analyze_hands(image: np.ndarray) -> Dict:
     return {"hands": [], "detected": False}
 
 
-def recognize_gesture(landmarks: List[Dict]) -> str:
-    """Recognize hand gesture from landmarks using ML-based rules"""
+# Finger tip / base landmark IDs for index, middle, ring and pinky
+FINGER_TIP_IDS = np.array([8, 12, 16, 20])
+FINGER_BASE_IDS = np.array([5, 9, 13, 17])
+
+# Bit flags for extended fingers: thumb=1, index=2, middle=4, ring=8, pinky=16
+FINGER_BITS = np.array([2, 4, 8, 16])
+
+# Gesture lookup by finger bitmask; codes not listed fall back to pinch/open
+GESTURE_CODES = {
+    0b00000: "FIST",
+    0b00001: "THUMBS_UP",
+    0b00010: "POINT",
+    0b00011: "POINT",
+    0b00110: "VICTORY",
+    0b00111: "VICTORY",
+    0b01110: "THREE",
+    0b01111: "THREE",
+    0b10000: "PINKY",
+    0b10001: "PINKY",
+    0b11111: "OPEN",
+}
+
+
+def recognize_gesture(landmarks: np.ndarray) -> str:
+    """Recognize hand gesture from a (21, 3) landmark array using ML-based rules"""
     if len(landmarks) < 21:
         return "UNKNOWN"
     
-    # Finger tip IDs: thumb=4, index=8, middle=12, ring=16, pinky=20
-    # Finger base IDs: thumb=2, index=5, middle=9, ring=13, pinky=17
-    
-    def is_finger_extended(tip_id, base_id):
-        return landmarks[tip_id]["y"] < landmarks[base_id]["y"]
-    
-    def is_thumb_extended():
-        # Thumb extends sideways
-        return abs(landmarks[4]["x"] - landmarks[2]["x"]) > 0.05
-    
-    thumb = is_thumb_extended()
-    index = is_finger_extended(8, 5)
-    middle = is_finger_extended(12, 9)
-    ring = is_finger_extended(16, 13)
-    pinky = is_finger_extended(20, 17)
-    
-    # Gesture recognition
-    if not any([index, middle, ring, pinky]):
-        if thumb:
-            return "THUMBS_UP"
-        return "FIST"
-    
-    if index and middle and not ring and not pinky:
-        return "VICTORY"
-    
-    if index and not middle and not ring and not pinky:
-        return "POINT"
+    # A finger is extended when its tip is above its base; the thumb extends sideways
+    extended = landmarks[FINGER_TIP_IDS, 1] < landmarks[FINGER_BASE_IDS, 1]
+    thumb = abs(landmarks[4, 0] - landmarks[2, 0]) > 0.05
+    code = int(thumb) | int(extended @ FINGER_BITS)
     
-    if all([thumb, index, middle, ring, pinky]):
-        return "OPEN"
-    
-    if index and middle and ring and not pinky:
-        return "THREE"
-    
-    if not index and not middle and not ring and pinky:
-        return "PINKY"
-    
-    if thumb and pinky and not index and not middle and not ring:
-        return "ROCK"
+    gesture = GESTURE_CODES.get(code)
+    if gesture:
+        return gesture
     
     # Pinch detection
-    pinch_dist = calculate_distance(landmarks[4], landmarks[8])
-    if pinch_dist < 0.05:
+    if np.linalg.norm(landmarks[4] - landmarks[8]) < 0.05:
         return "PINCH"
     
     return "OPEN"
 
 
-def calculate_distance(p1: Dict, p2: Dict) -> float:
+def calculate_distance(p1: np.ndarray, p2: np.ndarray) -> float:
     """Calculate distance between two landmark points"""
-    return ((p1["x"] - p2["x"])**2 + (p1["y"] - p2["y"])**2 + (p1.get("z", 0) - p2.get("z", 0))**2)**0.5
+    return float(np.linalg.norm(p1 - p2))
 
 
 # ====================
 # Audio Processing
 # ====================
 
-def analyze_audio_beats(audio_path: str) -> Dict:
-    """Analyze audio file for tempo and beat positions"""
+# aubio analysis window / hop sizes (samples)
+AUBIO_WIN_SIZE = 1024
+AUBIO_HOP_SIZE = 512
+
+
+def track_beats_aubio(y: np.ndarray, sr: int):
+    """Streaming beat tracking with aubio, fed block by block. Returns (tempo, beat_times, onset_env)."""
+    tempo_o = aubio.tempo("default", AUBIO_WIN_SIZE, AUBIO_HOP_SIZE, sr)
+    onset_o = aubio.onset("default", AUBIO_WIN_SIZE, AUBIO_HOP_SIZE, sr)
+    
+    samples = np.ascontiguousarray(y, dtype=np.float32)
+    samples = np.pad(samples, (0, -len(samples) % AUBIO_HOP_SIZE))
+    
+    beat_times = []
+    onset_env = []
+    for start in range(0, len(samples), AUBIO_HOP_SIZE):
+        block = samples[start:start + AUBIO_HOP_SIZE]
+        if tempo_o(block)[0]:
+            beat_times.append(float(tempo_o.get_last_s()))
+        onset_o(block)
+        onset_env.append(float(onset_o.get_descriptor()))
+    
+    return float(tempo_o.get_bpm()), beat_times, onset_env
+
+
+def analyze_audio_beats(audio: Union[str, BinaryIO]) -> Dict:
+    """Analyze an audio file (path or in-memory file object) for tempo and beat positions"""
     if not LIBROSA_AVAILABLE:
         return {"tempo": 120, "beats": [], "error": "Librosa not available"}
     
     try:
-        y, sr = librosa.load(audio_path, duration=30)  # Load first 30 seconds
-        tempo, beat_frames = librosa.beat.beat_track(y=y, sr=sr)
-        beat_times = librosa.frames_to_time(beat_frames, sr=sr).tolist()
+        # Load first 30 seconds, mono, with a fast resampler
+        y, sr = librosa.load(audio, sr=22050, mono=True, res_type="soxr_qq", duration=30)
         
-        # Get onset strength for reactivity
-        onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+        if AUBIO_AVAILABLE:
+            tempo, beat_times, onset_env = track_beats_aubio(y, sr)
+        else:
+            # Onset strength for reactivity; beat_track reuses it instead of
+            # computing its own spectrogram
+            onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+            tempo, beat_frames = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr)
+            beat_times = librosa.frames_to_time(beat_frames, sr=sr).tolist()
+            onset_env = onset_env.tolist()
         
         return {
             "tempo": float(tempo),
             "beats": beat_times,
             "duration": float(len(y) / sr),
-            "onset_strength": onset_env.tolist()[:100]  # First 100 samples
+            "onset_strength": onset_env[:100]  # First 100 samples
         }
     except Exception as e:
         logger.error(f"Audio analysis error: {e}")
         return {"tempo": 120, "beats": [], "error": str(e)}
 
+# ====================
+# Wire Encoding
+# ====================
+
+# Binary analysis message (little-endian):
+#   [u32 meta length][meta JSON, space-padded to 4 bytes][landmark blocks...]
+# Each landmark block is [u8 source id][u8 stride][u16 count] followed by
+# count * stride float32 values. Hand blocks follow the order of meta.hands.hands.
+ANALYSIS_HEADER = struct.Struct("<I")
+LANDMARK_BLOCK_HEADER = struct.Struct("<BBH")
+LANDMARK_SOURCES = {"pose": 0, "face_mesh": 1, "hands": 2}
+
+
+def dump_json(message: Dict) -> bytes:
+    """Serialize a message with orjson; numpy arrays and scalars are encoded natively"""
+    return orjson.dumps(message, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def encode_analysis(response: Dict, binary: bool = False):
+    """
+    Serialize landmark arrays in an analysis response for the wire.
+    
+    Returns a JSON-ready dict with packed landmark lists, or, when ``binary``
+    is set, a bytes message whose landmarks travel as raw float32 blocks.
+    """
+    blocks = []
+    
+    def convert(source: str, result: Dict) -> Dict:
+        landmarks = result.get("landmarks")
+        if not isinstance(landmarks, np.ndarray):
+            return result
+        result = dict(result)
+        if binary:
+            del result["landmarks"]
+            blocks.append(LANDMARK_BLOCK_HEADER.pack(
+                LANDMARK_SOURCES[source], landmarks.shape[1], len(landmarks)
+            ))
+            blocks.append(landmarks.astype(np.float32, copy=False).tobytes())
+        else:
+            result["landmarks"] = pack_landmarks(landmarks)
+        return result
+    
+    message = dict(response)
+    for source in ("pose", "face_mesh"):
+        if source in message:
+            message[source] = convert(source, message[source])
+    if "hands" in message:
+        message["hands"] = {
+            **message["hands"],
+            "hands": [convert("hands", hand) for hand in message["hands"]["hands"]]
+        }
+    
+    if not binary:
+        return message
+    
+    meta = dump_json(message)
+    meta += b" " * (-len(meta) % 4)  # Keep the float32 blocks 4-byte aligned
+    return b"".join([ANALYSIS_HEADER.pack(len(meta)), meta, *blocks])
+
+
+# ====================
+# Inference Queues
+# ====================
+
+class OverloadedError(Exception):
+    """Raised when an analyzer queue is full and a frame has to be rejected"""
+
+
+class AnalyzerQueue:
+    """
+    Bounded request queue for one analyzer, run off the event loop.
+    
+    MediaPipe and FER take one image per call, so requests are not batched:
+    each one is handed to the executor as soon as it is dequeued, with up to
+    `concurrency` calls in flight so a slow call doesn't hold up the next.
+    The queue bound gives SLA-style admission control - when it is full the
+    request fails fast with OverloadedError instead of adding latency.
+    """
+    
+    def __init__(self, name: str, analyze, executor: ThreadPoolExecutor,
+                 concurrency: int, max_queue: int = 100):
+        self.name = name
+        self.analyze = analyze
+        self.executor = executor
+        self.concurrency = concurrency
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.worker: Optional[asyncio.Task] = None
+    
+    def start(self):
+        self.worker = asyncio.create_task(self.run())
+    
+    async def stop(self):
+        if self.worker:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+    
+    def full(self) -> bool:
+        return self.queue.full()
+    
+    async def submit(self, *args, **kwargs) -> Dict:
+        """Queue a request and wait for its result. Fails fast when the queue is full."""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((partial(self.analyze, *args, **kwargs), future))
+        except asyncio.QueueFull:
+            raise OverloadedError(f"{self.name} analyzer overloaded")
+        return await future
+    
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.concurrency)
+        
+        def resolve(future: asyncio.Future, call: asyncio.Future):
+            slots.release()
+            if future.done():
+                return  # Requester went away
+            if call.cancelled():
+                future.cancel()
+            elif call.exception() is not None:
+                future.set_exception(call.exception())
+            else:
+                future.set_result(call.result())
+        
+        while True:
+            await slots.acquire()
+            analyze, future = await self.queue.get()
+            if future.done():
+                slots.release()
+                continue  # Requester went away
+            call = loop.run_in_executor(self.executor, analyze)
+            call.add_done_callback(partial(resolve, future))
+
+
+analyzer_queues: Dict[str, AnalyzerQueue] = {}
+
+@app.on_event("startup")
+async def start_analyzer_queues():
+    """Start one queue worker per analyzer (keys match the analysis response fields)"""
+    for name, analyze, executor, concurrency in (
+        ("emotion", analyze_emotion, emotion_pool, 1),
+        ("pose", analyze_pose, inference_pool, INFERENCE_WORKERS),
+        ("face_mesh", analyze_face_mesh, inference_pool, INFERENCE_WORKERS),
+        ("hands", analyze_hands, inference_pool, INFERENCE_WORKERS),
+    ):
+        analyzer_queues[name] = AnalyzerQueue(name, analyze, executor, concurrency)
+        analyzer_queues[name].start()
+
+@app.on_event("shutdown")
+async def stop_analyzer_queues():
+    for analyzer_queue in analyzer_queues.values():
+        await analyzer_queue.stop()
+    analyzer_queues.clear()
+    inference_pool.shutdown(wait=False)
+    emotion_pool.shutdown(wait=False)
+
 # ====================
 # REST Endpoints
 # ====================
@@ -443,10 +1104,10 @@ async def root():
         "service": "Etherial Particles API v2.0",
         "version": "2.0.0",
         "features": {
-            "emotion_detection": FER_AVAILABLE and emotion_detector is not None,
-            "pose_detection": MEDIAPIPE_AVAILABLE and pose_detector is not None,
-            "face_mesh": MEDIAPIPE_AVAILABLE and face_mesh_detector is not None,
-            "hand_gesture_ml": MEDIAPIPE_AVAILABLE and hand_detector is not None,
+            "emotion_detection": FER_AVAILABLE and emotion_detectors is not None,
+            "pose_detection": MEDIAPIPE_AVAILABLE and pose_detectors is not None,
+            "face_mesh": MEDIAPIPE_AVAILABLE and face_mesh_detectors is not None,
+            "hand_gesture_ml": MEDIAPIPE_AVAILABLE and hand_detectors is not None,
             "beat_detection": LIBROSA_AVAILABLE
         },
         "gestures_supported": [
@@ -476,7 +1137,8 @@ async def analyze_emotion_endpoint(file: UploadFile = File(...)):
         contents = await file.read()
         nparr = np.frombuffer(contents, np.uint8)
         image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        result = analyze_emotion(image)
+        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        result = await asyncio.get_running_loop().run_in_executor(emotion_pool, analyze_emotion, rgb_image)
         return JSONResponse(content=result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -485,13 +1147,31 @@ async def analyze_emotion_endpoint(file: UploadFile = File(...)):
 async def analyze_audio_endpoint(file: UploadFile = File(...)):
     """Analyze uploaded audio file for beats"""
     try:
-        # Save temporarily
-        temp_path = f"/tmp/audio_{int(time.time())}.mp3"
         contents = await file.read()
-        with open(temp_path, "wb") as f:
-            f.write(contents)
+        loop = asyncio.get_running_loop()
+        
+        # Formats soundfile can parse (wav/flac/ogg, ...) are decoded straight
+        # from memory; anything else goes through a temp file for audioread
+        audio = None
+        if LIBROSA_AVAILABLE:
+            try:
+                audio = BytesIO(contents)
+                soundfile.info(audio)
+                audio.seek(0)
+            except Exception:
+                audio = None
+        
+        if audio is not None:
+            result = await loop.run_in_executor(None, analyze_audio_beats, audio)
+        else:
+            suffix = os.path.splitext(file.filename or "")[1] or ".mp3"
+            with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+                f.write(contents)
+            try:
+                result = await loop.run_in_executor(None, analyze_audio_beats, f.name)
+            finally:
+                os.remove(f.name)
         
-        result = analyze_audio_beats(temp_path)
         return JSONResponse(content=result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -500,6 +1180,195 @@ async def analyze_audio_endpoint(file: UploadFile = File(...)):
 # WebSocket Endpoint
 # ====================
 
+# Minimum seconds between emotion analyses per connection
+EMOTION_INTERVAL = 0.5
+
+# Longest pause (in frames) between detection attempts after repeated misses
+MAX_DETECTION_BACKOFF = 8
+
+# Results reported for an analyzer whose attempt was skipped by back-off
+SKIPPED_RESULTS = {
+    "pose": {"landmarks": [], "detected": False, "skipped": True},
+    "face_mesh": {"landmarks": [], "detected": False, "skipped": True},
+    "hands": {"hands": [], "detected": False, "skipped": True},
+}
+
+
+class DetectionBackoff:
+    """
+    Per-connection, per-analyzer hysteresis for empty scenes.
+    
+    After a miss, detection is retried after 1, 2, 4, ... frames (capped at
+    MAX_DETECTION_BACKOFF) until something is found again, so an empty
+    camera view stops costing a full detector pass every frame.
+    """
+    
+    def __init__(self):
+        self.frame_i = 0
+        self.next_try = 0
+        self.miss_streak = 0
+    
+    def should_run(self) -> bool:
+        run = self.frame_i >= self.next_try
+        self.frame_i += 1
+        return run
+    
+    def record(self, detected: bool):
+        if detected:
+            self.miss_streak = 0
+            self.next_try = 0
+        else:
+            self.next_try = self.frame_i + min(MAX_DETECTION_BACKOFF, 1 << self.miss_streak) - 1
+            self.miss_streak += 1
+
+
+# Opcodes (first byte) of binary client messages
+OP_FRAME = 0   # Payload: raw JPEG/PNG bytes, analyzed with the cached config
+OP_PING = 1    # No payload
+OP_CONFIG = 2  # Payload: UTF-8 JSON analysis config
+
+# Frame message fields a client can set once through a config message
+FRAME_CONFIG_KEYS = ("analyze_emotion", "analyze_pose", "analyze_face_mesh",
+                     "analyze_hands", "binary_landmarks")
+
+async def analyze_frame(websocket: WebSocket, data: Dict):
+    """Analyze one video frame for emotion, pose, face mesh, and/or hands and send the result"""
+    try:
+        buffers = websocket.state.frame_buffers
+        if "image" in data:
+            image = decode_image(data["image"], buffers)
+        else:
+            image = decode_base64_image(data.get("data", ""), buffers)
+        # Single BGR->RGB pass shared by every analyzer
+        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=buffers.get("rgb", image.shape))
+        
+        requested = {
+            "emotion": data.get("analyze_emotion", False),
+            "pose": data.get("analyze_pose", False),
+            "face_mesh": data.get("analyze_face_mesh", False),
+            "hands": data.get("analyze_hands", True),  # Default on
+        }
+        
+        # Admission check before any work is queued or any state advances
+        full = [name for name, enabled in requested.items() if enabled and analyzer_queues[name].full()]
+        if full:
+            await websocket.send_json({
+                "type": "error",
+                "error": "overloaded",
+                "message": f"{', '.join(full)} analyzer overloaded"
+            })
+            return
+        
+        # Emotion changes on a human timescale: run it at most every
+        # EMOTION_INTERVAL seconds and reuse the last result in between
+        reuse_emotion = False
+        prev_emotion_ts = websocket.state.last_emotion_ts
+        if requested["emotion"]:
+            now = time.monotonic()
+            if now - prev_emotion_ts >= EMOTION_INTERVAL:
+                websocket.state.last_emotion_ts = now
+            else:
+                reuse_emotion = True
+                requested["emotion"] = False
+        
+        analyzer_kwargs = websocket.state.analyzer_kwargs
+        
+        # Skip detectors that are backing off after recent misses
+        backoff = websocket.state.detection_backoff
+        skipped = [name for name in backoff if requested[name] and not backoff[name].should_run()]
+        for name in skipped:
+            requested[name] = False
+        
+        async def run(name: str, **kwargs):
+            return await analyzer_queues[name].submit(rgb_image, **analyzer_kwargs[name], **kwargs)
+        
+        async def run_emotion(face_mesh_task: Optional[asyncio.Future]):
+            # When the face mesh runs on this frame, hand its face box to FER
+            # so it can skip its own face detector
+            face_box = None
+            if face_mesh_task is not None:
+                try:
+                    face_box = (await face_mesh_task).get("face_box")
+                except Exception:
+                    pass
+            return await run("emotion", face_box=face_box)
+        
+        tasks = {
+            name: asyncio.ensure_future(run(name))
+            for name, enabled in requested.items() if enabled and name != "emotion"
+        }
+        if requested["emotion"]:
+            tasks["emotion"] = asyncio.ensure_future(run_emotion(tasks.get("face_mesh")))
+        names = list(tasks)
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        
+        # A queue can still fill up between admission and submit (emotion waits
+        # for the face mesh); send what succeeded and report the rest
+        overloaded = [name for name, result in zip(names, results) if isinstance(result, OverloadedError)]
+        for result in results:
+            if isinstance(result, Exception) and not isinstance(result, OverloadedError):
+                raise result
+        
+        response = {
+            "type": "analysis",
+            **{name: result for name, result in zip(names, results) if name not in overloaded}
+        }
+        if overloaded:
+            response["overloaded"] = overloaded
+        if "emotion" in overloaded:
+            # Retry on the next frame and keep the previous result meanwhile
+            websocket.state.last_emotion_ts = prev_emotion_ts
+            reuse_emotion = True
+        if "emotion" in response:
+            manager.last_emotion = response["emotion"]
+            websocket.state.last_emotion = response["emotion"]
+        elif reuse_emotion:
+            response["emotion"] = websocket.state.last_emotion
+        if "pose" in response:
+            manager.last_pose = response["pose"]
+        # An overloaded attempt saw nothing either way: don't record it, so a
+        # detector that was due keeps its turn and runs on the next frame
+        for name in names:
+            if name in backoff and name not in overloaded:
+                backoff[name].record(response[name].get("detected", False))
+        for name in skipped:
+            response[name] = dict(SKIPPED_RESULTS[name])
+        
+        # Clients that opt in get landmarks as raw float32 blocks
+        if data.get("binary_landmarks", False):
+            await websocket.send_bytes(encode_analysis(response, binary=True))
+        else:
+            # Text frame: binary frames are reserved for the float32 format above
+            await websocket.send_text(dump_json(encode_analysis(response)).decode())
+        
+    except WebSocketDisconnect:
+        raise
+    except Exception as e:
+        await websocket.send_json({
+            "type": "error",
+            "message": str(e)
+        })
+
+
+async def frame_worker(websocket: WebSocket, slot: Dict):
+    """Analyze whatever frame is in the connection's slot, one at a time, until the slot is closed"""
+    while True:
+        await slot["ready"].wait()
+        slot["ready"].clear()
+        if slot["closed"]:
+            return
+        data, slot["frame"] = slot["frame"], None
+        try:
+            await analyze_frame(websocket, data)
+        except WebSocketDisconnect:
+            return  # The receive loop handles the disconnect
+        except Exception as e:
+            if slot["closed"]:
+                return
+            # Only this frame is lost; keep serving the connection
+            logger.error(f"Frame worker error: {e}")
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """
@@ -507,12 +1376,24 @@ async def websocket_endpoint(websocket: WebSocket):
     
     Receives:
     - {"type": "frame", "data": "base64_image"} - Analyze video frame
+      (add "binary_landmarks": true to get analysis results as binary messages,
+      see encode_analysis)
+    - {"type": "config", "analyze_pose": true, ...} - Cache analysis options
+      for binary frames (any of FRAME_CONFIG_KEYS)
+    - {"type": "ping"}
+    - Binary messages: one opcode byte (OP_FRAME / OP_PING / OP_CONFIG)
+      followed by the payload, e.g. OP_FRAME + raw JPEG bytes. This skips
+      base64 and JSON on the per-frame path.
     - {"type": "audio_chunk", "data": "base64_audio"} - Analyze audio
     
     Sends:
     - {"type": "emotion", "data": {...}}
     - {"type": "pose", "data": {...}}
     - {"type": "beat", "data": {...}}
+    
+    Frames use newest-wins backpressure: the connection holds at most one
+    pending frame, and a frame arriving while analysis is busy replaces it,
+    so latency never builds up beyond a single frame.
     """
     await manager.connect(websocket)
     
@@ -520,54 +1401,81 @@ async def websocket_endpoint(websocket: WebSocket):
     await websocket.send_json({
         "type": "connected",
         "features": {
-            "emotion": FER_AVAILABLE and emotion_detector is not None,
-            "pose": MEDIAPIPE_AVAILABLE and pose_detector is not None,
+            "emotion": FER_AVAILABLE and emotion_detectors is not None,
+            "pose": MEDIAPIPE_AVAILABLE and pose_detectors is not None,
             "audio": LIBROSA_AVAILABLE
         }
     })
     
+    # Reusable decode/color-convert buffers. Safe to share across frames because
+    # the worker finishes a frame's analyses before decoding the next one.
+    websocket.state.frame_buffers = FrameBuffers()
+    
+    # Per-connection emotion throttling state
+    websocket.state.last_emotion = manager.last_emotion
+    websocket.state.last_emotion_ts = 0.0
+    
+    # Per-connection analyzer arguments: face box cache for emotion, landmark
+    # smoothing for pose and face mesh, and the checked-out detectors (below)
+    websocket.state.analyzer_kwargs = {
+        "emotion": {"tracker": FaceTracker()},
+        "pose": {"smoother": OneEuroFilter()},
+        "face_mesh": {"smoother": OneEuroFilter()},
+        "hands": {},
+    }
+    
+    # Detection back-off for empty scenes
+    websocket.state.detection_backoff = {
+        name: DetectionBackoff() for name in ("pose", "face_mesh", "hands")
+    }
+    
+    # Analysis options applied to binary frames
+    websocket.state.frame_config = {}
+    
+    # Latest unprocessed frame; the receiver overwrites it, the worker consumes it
+    slot = {"frame": None, "ready": asyncio.Event(), "closed": False}
+    worker = asyncio.create_task(frame_worker(websocket, slot))
+    
+    loop = asyncio.get_running_loop()
+    detectors = {}
     try:
+        # Per-connection MediaPipe instances, so landmark tracking only ever sees
+        # this client's frames (frames of one client are analyzed in order).
+        # Checked out off the event loop since an instance may need to be created.
+        for name, pool in (("pose", pose_detectors), ("face_mesh", face_mesh_detectors), ("hands", hand_detectors)):
+            if pool:
+                detectors[name] = (pool, await loop.run_in_executor(inference_pool, pool.checkout))
+                websocket.state.analyzer_kwargs[name]["detector"] = detectors[name][1]
+        
         while True:
-            data = await websocket.receive_json()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            
+            if message.get("bytes") is not None:
+                payload = message["bytes"]
+                opcode = payload[0] if payload else None
+                if opcode == OP_FRAME:
+                    # memoryview slice: no copy of the JPEG bytes
+                    data = {"type": "frame", "image": memoryview(payload)[1:], **websocket.state.frame_config}
+                elif opcode == OP_CONFIG:
+                    data = {"type": "config", **orjson.loads(payload[1:])}
+                elif opcode == OP_PING:
+                    data = {"type": "ping"}
+                else:
+                    continue
+            else:
+                data = orjson.loads(message.get("text") or "{}")
             msg_type = data.get("type")
             
             if msg_type == "frame":
-                # Analyze video frame for emotion, pose, face mesh, and/or hands
-                try:
-                    image = decode_base64_image(data.get("data", ""))
-                    
-                    # Run analyses based on client request
-                    response = {"type": "analysis"}
-                    
-                    # Emotion (run less frequently for performance)
-                    if data.get("analyze_emotion", False):
-                        emotion_result = analyze_emotion(image)
-                        response["emotion"] = emotion_result
-                        manager.last_emotion = emotion_result
-                    
-                    # Pose (body tracking)
-                    if data.get("analyze_pose", False):
-                        pose_result = analyze_pose(image)
-                        response["pose"] = pose_result
-                        manager.last_pose = pose_result
-                    
-                    # Face Mesh (468 landmarks)
-                    if data.get("analyze_face_mesh", False):
-                        face_result = analyze_face_mesh(image)
-                        response["face_mesh"] = face_result
-                    
-                    # Hands (gesture recognition)
-                    if data.get("analyze_hands", True):  # Default on
-                        hand_result = analyze_hands(image)
-                        response["hands"] = hand_result
-                    
-                    await websocket.send_json(response)
-                    
-                except Exception as e:
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": str(e)
-                    })
+                slot["frame"] = data
+                slot["ready"].set()
+            
+            elif msg_type == "config":
+                websocket.state.frame_config = {
+                    key: data[key] for key in FRAME_CONFIG_KEYS if key in data
+                }
             
             elif msg_type == "ping":
                 await websocket.send_json({"type": "pong"})
@@ -577,6 +1485,15 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
         manager.disconnect(websocket)
+    finally:
+        # Let the frame in progress finish rather than cancelling it: its
+        # inference calls keep running in their threads either way, and the
+        # detectors must not be handed back while one is still using them
+        slot["closed"] = True
+        slot["ready"].set()
+        await worker
+        for pool, detector in detectors.values():
+            await loop.run_in_executor(inference_pool, pool.checkin, detector)
 
 # ====================
 # Beat Streaming (Advanced)
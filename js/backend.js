@@ -8,6 +8,11 @@
  */
 
 export class BackendController {
+    // Opcodes (first byte) of binary messages sent to the server
+    static OP_FRAME = 0;
+    static OP_PING = 1;
+    static OP_CONFIG = 2;
+
     constructor(options = {}) {
         this.wsUrl = options.wsUrl || 'ws://localhost:8001/ws';
         this.beatsWsUrl = options.beatsWsUrl || 'ws://localhost:8001/ws/beats';
@@ -54,8 +59,7 @@ export class BackendController {
         // Frame sending settings
         this.sendFrameInterval = 100; // ms between frames
         this.lastFrameSent = 0;
-        this.emotionFrameInterval = 500; // Emotion detection less frequent
-        this.lastEmotionFrame = 0;
+        this.lastConfig = null; // Analysis config last sent to the server
     }
 
     /**
@@ -67,11 +71,13 @@ export class BackendController {
                 console.log('🔌 Connecting to backend:', this.wsUrl);
 
                 this.ws = new WebSocket(this.wsUrl);
+                this.ws.binaryType = 'arraybuffer';
 
                 this.ws.onopen = () => {
                     console.log('✅ Backend connected');
                     this.connected = true;
                     this.reconnectAttempts = 0;
+                    this.lastConfig = null;
                     if (this.onConnect) this.onConnect();
                     resolve(true);
                 };
@@ -89,7 +95,11 @@ export class BackendController {
                 };
 
                 this.ws.onmessage = (event) => {
-                    this.handleMessage(JSON.parse(event.data));
+                    if (typeof event.data === 'string') {
+                        this.handleMessage(JSON.parse(event.data));
+                    } else {
+                        this.handleMessage(this.decodeAnalysis(event.data));
+                    }
                 };
 
             } catch (error) {
@@ -145,7 +155,7 @@ export class BackendController {
                 if (data.pose) {
                     this.pose = {
                         detected: data.pose.detected,
-                        landmarks: data.pose.landmarks || [],
+                        landmarks: this.unpackLandmarks(data.pose.landmarks),
                         keyPoints: {
                             nose: data.pose.nose,
                             leftHand: data.pose.left_hand,
@@ -185,6 +195,56 @@ export class BackendController {
         }
     }
 
+    /**
+     * Decode a binary analysis message
+     * Layout: [u32 meta length][meta JSON][blocks of [u8 source][u8 stride][u16 count] + float32 data]
+     * @param {ArrayBuffer} buffer - Binary message from the server
+     * @returns {Object} Analysis message with landmarks attached as {xyz: Float32Array, stride}
+     */
+    decodeAnalysis(buffer) {
+        const view = new DataView(buffer);
+        const metaLength = view.getUint32(0, true);
+        const data = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, metaLength)));
+
+        const sources = ['pose', 'face_mesh', 'hands'];
+        let handIndex = 0;
+        let offset = 4 + metaLength;
+
+        while (offset < buffer.byteLength) {
+            const source = sources[view.getUint8(offset)];
+            const stride = view.getUint8(offset + 1);
+            const count = view.getUint16(offset + 2, true);
+            const packed = { xyz: new Float32Array(buffer, offset + 4, count * stride), stride };
+            offset += 4 + count * stride * 4;
+
+            if (source === 'hands') {
+                data.hands.hands[handIndex++].landmarks = packed;
+            } else if (data[source]) {
+                data[source].landmarks = packed;
+            }
+        }
+
+        return data;
+    }
+
+    /**
+     * Expand a packed landmark list ({xyz: [x0, y0, z0, ...], stride}) into points
+     * @param {Object} packed - Flat landmark array as sent by the server
+     * @returns {Array<{x: number, y: number, z: number, visibility?: number}>}
+     */
+    unpackLandmarks(packed) {
+        if (!packed || !packed.xyz) return [];
+
+        const { xyz, stride } = packed;
+        const points = [];
+        for (let i = 0; i < xyz.length; i += stride) {
+            const point = { x: xyz[i], y: xyz[i + 1], z: xyz[i + 2] };
+            if (stride > 3) point.visibility = xyz[i + 3];
+            points.push(point);
+        }
+        return points;
+    }
+
     /**
      * Send video frame to backend for analysis
      * @param {HTMLCanvasElement|HTMLVideoElement} source - Video source
@@ -199,11 +259,19 @@ export class BackendController {
         if (now - this.lastFrameSent < this.sendFrameInterval) return;
         this.lastFrameSent = now;
 
-        // Rate limit emotion detection more heavily
-        const analyzeEmotion = options.emotion && (now - this.lastEmotionFrame > this.emotionFrameInterval);
-        if (analyzeEmotion) this.lastEmotionFrame = now;
-
         try {
+            // Analysis options are cached server-side; only send them when they change.
+            // The server throttles emotion detection itself.
+            const config = JSON.stringify({
+                analyze_emotion: !!options.emotion,
+                analyze_pose: !!options.pose,
+                binary_landmarks: true
+            });
+            if (config !== this.lastConfig) {
+                this.sendBinary(BackendController.OP_CONFIG, new TextEncoder().encode(config));
+                this.lastConfig = config;
+            }
+
             // Convert to canvas if video element
             let canvas;
             if (source instanceof HTMLVideoElement) {
@@ -216,21 +284,26 @@ export class BackendController {
                 canvas = source;
             }
 
-            // Get base64 image
-            const base64 = canvas.toDataURL('image/jpeg', 0.7);
-
-            this.ws.send(JSON.stringify({
-                type: 'frame',
-                data: base64,
-                analyze_emotion: analyzeEmotion,
-                analyze_pose: options.pose
-            }));
+            // Send raw JPEG bytes (no base64/JSON)
+            canvas.toBlob((blob) => {
+                if (blob) this.sendBinary(BackendController.OP_FRAME, blob);
+            }, 'image/jpeg', 0.7);
 
         } catch (error) {
             console.error('Error sending frame:', error);
         }
     }
 
+    /**
+     * Send a binary message: one opcode byte followed by the payload
+     * @param {number} opcode - BackendController.OP_FRAME / OP_PING / OP_CONFIG
+     * @param {Blob|ArrayBufferView} payload - Message body
+     */
+    sendBinary(opcode, payload = new Uint8Array(0)) {
+        if (!this.connected || !this.ws || this.ws.readyState !== WebSocket.OPEN) return;
+        this.ws.send(new Blob([new Uint8Array([opcode]), payload]));
+    }
+
     /**
      * Start beat synchronization at given tempo
      * @param {number} tempo - Beats per minute